@@ -1,13 +1,10 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import os
-import tempfile
-import gspread
-from google.oauth2.service_account import Credentials
 import json
-from pdfrw import PdfReader, PdfWriter
+from pathlib import Path
 import io
+from concurrent.futures import ThreadPoolExecutor
 
 # MUST BE FIRST - Page configuration
 st.set_page_config(
@@ -19,93 +16,198 @@ st.set_page_config(
 
 # Google Sheets setup for deployment
 SHEET_URL = "https://docs.google.com/spreadsheets/d/1vT3HU5fv8LM8noNmlUkZqYbZyhG8gBWOrYx2MOm51mQ/edit#gid=0"
+SHEET_ID = SHEET_URL.split("/d/")[1].split("/")[0]
+# Opening by key needs no Drive search, so the Sheets scope is enough
+SHEET_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+@st.cache_resource(show_spinner=False)
+def _gspread_client():
+    """Authorize the gspread client once per process"""
+    # Imported here so reruns that never connect don't pay for it
+    import gspread
+    
+    # For Streamlit Cloud
+    if 'google_sheets' in st.secrets:
+        creds_dict = json.loads(st.secrets['google_sheets']['credentials_json'])
+    else:
+        # For local testing
+        with open('credentials.json') as f:
+            creds_dict = json.load(f)
+    
+    return gspread.service_account_from_dict(creds_dict, scopes=SHEET_SCOPES)
+
+@st.cache_resource(show_spinner=False)
+def _open_worksheet():
+    """Open the prescription worksheet once per process"""
+    return _gspread_client().open_by_key(SHEET_ID).sheet1
+
 def setup_google_sheets():
     try:
-        # For Streamlit Cloud
-        if 'google_sheets' in st.secrets:
-            creds_dict = json.loads(st.secrets['google_sheets']['credentials_json'])
-            credentials = Credentials.from_service_account_info(creds_dict)
-        else:
-            # For local testing
-            with open('credentials.json') as f:
-                creds_dict = json.load(f)
-            credentials = Credentials.from_service_account_info(creds_dict)
-        
-        # Use gspread with default auth (handles scopes automatically)
-        client = gspread.service_account_from_dict(creds_dict)
-        
-        # Test connection
-        SHEET_NAME = "cosmoslim patient record"
-        sheet = client.open(SHEET_NAME).sheet1
-        st.success(f"✅ Connected to Google Sheet: {SHEET_NAME}")
-        return sheet
+        # Failures are not cached, so a broken connection is retried on the next rerun
+        return _open_worksheet()
         
     except Exception as e:
         st.error(f"❌ Google Sheets setup failed: {str(e)}")
         # Don't return None yet - let the app continue without Google Sheets
         st.info("📝 You can still generate PDFs without Google Sheets connection")
         return None
-def save_to_google_sheets(sheet, patient_data):
-    """Save prescription data to Google Sheets"""
+
+def build_sheet_row(patient_data):
+    """Build the Google Sheets row for a prescription, returning (prescription_id, row)"""
+    # One clock read so the timestamp and ID always agree
+    now = datetime.now()
+    timestamp = now.isoformat(sep=' ', timespec='seconds')
+    prescription_id = f"RX{now.year}{now.month:02d}{now.day:02d}{now.hour:02d}{now.minute:02d}{now.second:02d}"
+    
+    row_data = [
+        timestamp,
+        patient_data['patient_name'],
+        patient_data['age'],
+        patient_data['date'],
+        patient_data['treatment_type'],
+        patient_data.get('session', 'N/A'),
+        patient_data['follow_up_date'],
+        patient_data['instructions'],
+        prescription_id
+    ]
+    return prescription_id, row_data
+
+def save_to_google_sheets(sheet, rows):
+    """Append prescription rows to Google Sheets in one request
+
+    Returns None on success or the error message. Doesn't touch the page
+    or session state, so it is safe to run in a worker thread.
+    """
     try:
-        prescription_id = f"RX{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        row_data = [
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            patient_data['patient_name'],
-            patient_data['age'],
-            patient_data['date'],
-            patient_data['treatment_type'],
-            patient_data.get('session', 'N/A'),
-            patient_data['follow_up_date'],
-            patient_data['instructions'],
-            prescription_id
-        ]
-        
-        sheet.append_row(row_data)
-        st.success(f"✅ Data saved to Google Sheets! Prescription ID: {prescription_id}")
-        return prescription_id
+        # RAW stores user text as-is instead of parsing it as formulas/dates
+        sheet.append_rows(rows, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+        return None
         
     except Exception as e:
-        st.error(f"❌ Failed to save to Google Sheets: {str(e)}")
+        return str(e)
+
+def flush_pending_rows(sheet):
+    """Retry writing prescription rows from earlier failed saves in one request"""
+    pending = st.session_state.get('pending_rows', [])
+    if not pending:
+        return True
+    error = save_to_google_sheets(sheet, pending)
+    if error:
+        st.error(f"❌ Failed to save to Google Sheets: {error}")
+        return False
+    st.success(f"✅ Saved {len(pending)} prescription(s) to Google Sheets!")
+    st.session_state.pending_rows = []
+    return True
+
+TEMPLATE_PATH = "templates/prescription_template.pdf"
+
+@st.cache_resource(show_spinner=False)
+def _load_template_bytes(template_mtime):
+    """Read the PDF template file once per template version"""
+    with open(TEMPLATE_PATH, 'rb') as f:
+        return f.read()
+
+def _parse_template(template_mtime):
+    """Parse a private copy of the PDF template from the cached bytes"""
+    from pdfrw import PdfDict, PdfObject, PdfReader
+    
+    template = PdfReader(fdata=_load_template_bytes(template_mtime))
+    acro_form = template.Root.AcroForm
+    if acro_form and acro_form.Fields:
+        # Let viewers draw the filled values themselves and lock the fields,
+        # so the output reads like a flattened form without a second pass
+        acro_form.update(PdfDict(NeedAppearances=PdfObject('true')))
+        for field in acro_form.Fields:
+            field.Ff = PdfObject(str(int(field.Ff or 0) | 1))
+    return template
+
+# Field mapping - PDF form field name, patient_data key, value converter
+PDF_FIELD_SPEC = (
+    ('patient_name', 'patient_name', str),
+    ('age', 'age', str),
+    ('date', 'date', str),
+    ('treatment', 'treatment_type', str),
+    ('follow_up', 'follow_up_date', str),
+    ('instructions', 'instructions', str),
+    ('session', 'session', str),
+)
+
+@st.cache_data(show_spinner=False)
+def _write_plan(template_mtime):
+    """Resolve PDF_FIELD_SPEC to (field index, field name, data key, converter) once per template version"""
+    template = _parse_template(template_mtime)
+    if not hasattr(template.Root, 'AcroForm') or not template.Root.AcroForm.Fields:
+        return ()
+    
+    # Field names are PDF strings like '(Date)' - normalize to plain lowercase
+    fields_by_name = {
+        field.T.decode().lower(): index
+        for index, field in enumerate(template.Root.AcroForm.Fields)
+        if field.T is not None
+    }
+    return tuple(
+        (fields_by_name.get(field_name), field_name, data_key, convert)
+        for field_name, data_key, convert in PDF_FIELD_SPEC
+    )
+
+def _field_rect(field):
+    """Return a form field's (x, y, width, height), or None if it has no widget"""
+    # The rectangle lives on the widget annotation, which is usually a kid
+    rect = field.Rect or (field.Kids[0].Rect if field.Kids else None)
+    if not rect:
         return None
+    x1, y1, x2, y2 = map(float, rect)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+@st.cache_data(show_spinner=False)
+def _extract_fields(template_mtime):
+    """Collect form field details for debugging once per template version"""
+    template = _parse_template(template_mtime)
+    if not hasattr(template.Root, 'AcroForm') or not template.Root.AcroForm.Fields:
+        return []
+    
+    return [
+        {
+            'name': str(field.T) if hasattr(field, 'T') else 'No Name',
+            'type': str(field.FT) if hasattr(field, 'FT') else 'No Type',
+            'value': str(field.V) if hasattr(field, 'V') else 'No Value',
+            'rect': _field_rect(field)
+        }
+        for field in template.Root.AcroForm.Fields
+    ]
 
 def debug_pdf_fields():
     """Debug function to see ALL PDF field information"""
     try:
-        template_path = "templates/prescription_template.pdf"
-        
-        if not os.path.exists(template_path):
-            st.error(f"❌ PDF template not found at: {template_path}")
+        if not os.path.exists(TEMPLATE_PATH):
+            st.error(f"❌ PDF template not found at: {TEMPLATE_PATH}")
             return []
         
-        template = PdfReader(template_path)
+        all_fields = _extract_fields(os.path.getmtime(TEMPLATE_PATH))
         
         st.subheader("🔍 PDF Form Field Analysis")
         
-        if not hasattr(template.Root, 'AcroForm') or not template.Root.AcroForm.Fields:
+        if not all_fields:
             st.error("❌ No AcroForm fields found in PDF!")
             st.info("This PDF might not be a fillable form")
             return []
         
-        all_fields = []
+        # One table instead of a handful of st.write calls per field
+        rows = []
+        for field_info in all_fields:
+            x, y, width, height = field_info['rect'] or (None, None, None, None)
+            rows.append({
+                'Name': field_info['name'],
+                'Type': field_info['type'],
+                'Current Value': field_info['value'],
+                'x': x,
+                'y': y,
+                'Width': width,
+                'Height': height
+            })
         
         st.write("### Found Form Fields:")
-        for i, field in enumerate(template.Root.AcroForm.Fields):
-            field_info = {
-                'name': field.T if hasattr(field, 'T') else 'No Name',
-                'type': field.FT if hasattr(field, 'FT') else 'No Type',
-                'value': field.V if hasattr(field, 'V') else 'No Value',
-                'rect': field.Rect if hasattr(field, 'Rect') else 'No Rect'
-            }
-            all_fields.append(field_info)
-            
-            st.write(f"*Field {i+1}:*")
-            st.write(f"  - Name: {field_info['name']}")
-            st.write(f"  - Type: {field_info['type']}")
-            st.write(f"  - Current Value: {field_info['value']}")
-            st.write(f"  - Rectangle: {field_info['rect']}")
-            st.write("---")
+        st.dataframe(rows, use_container_width=True, hide_index=True)
         
         st.success(f"✅ Found {len(all_fields)} form fields")
         return all_fields
@@ -114,86 +216,74 @@ def debug_pdf_fields():
         st.error(f"❌ Cannot read PDF: {str(e)}")
         return []
 
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=64)
+def _render_pdf(template_mtime, patient_data):
+    """Fill the template with patient_data and return (pdf bytes, fill log)"""
+    from pdfrw import PdfWriter
+    
+    # Each fill gets its own tree, so concurrent sessions never share values
+    template = _parse_template(template_mtime)
+    fields = template.Root.AcroForm.Fields
+    fill_log = []
+    for index, field_name, data_key, convert in _write_plan(template_mtime):
+        if index is None:
+            fill_log.append((field_name, None))
+            continue
+        value = convert(patient_data[data_key])
+        fields[index].V = value
+        fill_log.append((field_name, value))
+    
+    # Save the filled PDF in memory
+    buffer = io.BytesIO()
+    PdfWriter().write(buffer, template)
+    
+    return buffer.getvalue(), fill_log
+
 def generate_pdf_prescription(patient_data):
-    """Generate PDF prescription by filling form fields - SIMPLIFIED VERSION"""
+    """Generate PDF prescription by filling form fields
+
+    Returns (pdf bytes, fill log, error message) and leaves reporting to
+    show_pdf_status, so messages come out in a fixed order.
+    """
     try:
-        template_path = "templates/prescription_template.pdf"
-        
-        # Check if template exists
-        if not os.path.exists(template_path):
-            st.error(f"❌ PDF template not found at: {template_path}")
-            # List files to debug
-            try:
-                st.write("Available files in templates folder:")
-                for root, dirs, files in os.walk("."):
-                    for file in files:
-                        if file.endswith('.pdf'):
-                            st.write(f"📄 {os.path.join(root, file)}")
-            except:
-                pass
-            return None
-        
-        # Read template
-        template = PdfReader(template_path)
+        # Template bytes and field resolution are cached per template version
+        template_mtime = os.path.getmtime(TEMPLATE_PATH)
         
-        if not hasattr(template.Root, 'AcroForm') or not template.Root.AcroForm.Fields:
-            st.error("❌ No form fields found in PDF template!")
-            return None
+        if not _write_plan(template_mtime):
+            return None, [], "No form fields found in PDF template!"
         
-        st.write("### Filling PDF Fields:")
-        
-        # Field mapping - use EXACT field names from your PDF
-        field_mapping = {
-            'patient_name': patient_data['patient_name'],
-            'age': str(patient_data['age']),
-            'date': patient_data['date'],
-            'treatment': patient_data['treatment_type'],
-            'follow_up': patient_data['follow_up_date'],
-            'instructions': patient_data['instructions']
-        }
-        
-        fields_filled = 0
-        for field in template.Root.AcroForm.Fields:
-            field_name = field.T if hasattr(field, 'T') else 'Unknown'
-            
-            # Try exact match first
-            if field_name in field_mapping:
-                field.V = field_mapping[field_name]
-                fields_filled += 1
-                st.write(f"✅ Filled: '{field_name}' with '{field_mapping[field_name]}'")
-            else:
-                # Try case-insensitive match
-                field_name_lower = field_name.lower()
-                for key, value in field_mapping.items():
-                    if key.lower() in field_name_lower or field_name_lower in key.lower():
-                        field.V = value
-                        fields_filled += 1
-                        st.write(f"✅ Filled: '{field_name}' with '{value}'")
-                        break
-                else:
-                    st.write(f"❓ No match for field: '{field_name}'")
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            output_path = tmp_file.name
-        
-        # Save the filled PDF
-        PdfWriter().write(output_path, template)
-        
-        st.success(f"✅ PDF generated! Filled {fields_filled} fields")
-        
-        # Important note about PDF viewers
-        st.warning("""
-        *Note for Viewing Filled PDF:*
-        - Download the PDF and open in *Adobe Acrobat Reader* for best results
-        - Some browsers don't display filled form fields properly
-        """)
-        
-        return output_path
+        # Identical resubmissions are served from the cache
+        pdf_data, fill_log = _render_pdf(template_mtime, patient_data)
+        return pdf_data, fill_log, None
         
     except Exception as e:
-        st.error(f"❌ PDF generation failed: {str(e)}")
-        return None
+        return None, [], f"PDF generation failed: {str(e)}"
+
+def show_pdf_status(fill_log, error):
+    """Report the outcome of generate_pdf_prescription on the page"""
+    if error:
+        st.error(f"❌ {error}")
+        return
+    
+    if st.session_state.get('debug', False):
+        # One message for the whole fill rather than one per field
+        log_lines = ["### Filling PDF Fields:"]
+        for field_name, value in fill_log:
+            if value is None:
+                log_lines.append(f"- ❓ No PDF field for: '{field_name}'")
+            else:
+                log_lines.append(f"- ✅ Filled: '{field_name}' with '{value}'")
+        st.write("\n".join(log_lines))
+    
+    fields_filled = sum(value is not None for _, value in fill_log)
+    st.success(f"✅ PDF generated! Filled {fields_filled} fields")
+    
+    # Important note about PDF viewers
+    st.warning("""
+    *Note for Viewing Filled PDF:*
+    - Download the PDF and open in *Adobe Acrobat Reader* for best results
+    - Some browsers don't display filled form fields properly
+    """)
 
 def create_prescription_form():
     """Create the prescription input form"""
@@ -209,87 +299,80 @@ def create_prescription_form():
     
     st.header("Create New Prescription")
     
-    # Debug button
-    if st.button("🔍 Debug PDF Fields"):
+    # Debug output is opt-in so normal submissions stay quiet
+    debug = st.sidebar.checkbox("🐞 Debug mode", key="debug")
+    if debug and st.button("🔍 Debug PDF Fields"):
         debug_pdf_fields()
     
-    col1, col2 = st.columns(2)
+    # Inputs only trigger a rerun when the form is submitted
+    with st.form("prescription_form"):
+        col1, col2 = st.columns(2)
     
-    with col1:
-        patient_name = st.text_input(
-            "Patient Name *", 
-            placeholder="Enter full name",
-            key="patient_name"
-        )
+        with col1:
+            patient_name = st.text_input(
+                "Patient Name *", 
+                placeholder="Enter full name",
+                key="patient_name"
+            )
         
-        age = st.number_input(
-            "Age *", 
-            min_value=1, 
-            max_value=120, 
-            value=30,
-            key="age"
-        )
+            age = st.number_input(
+                "Age *", 
+                min_value=1, 
+                max_value=120, 
+                value=30,
+                key="age"
+            )
         
-        date = st.date_input(
-            "Date *", 
-            value=datetime.now().date(),
-            key="date"
-        )
+            date = st.date_input(
+                "Date *", 
+                value=datetime.now().date(),
+                key="date"
+            )
         
-    with col2:
-        treatment_options = ["Select Treatment", "Diode Laser", "HydraFacial", "Chemical Peel", "PRP Therapy"]
-        treatment = st.selectbox(
-            "Treatment Type *", 
-            options=treatment_options,
-            key="treatment"
-        )
+        with col2:
+            treatment_options = ["Select Treatment", "Diode Laser", "HydraFacial", "Chemical Peel", "PRP Therapy"]
+            treatment = st.selectbox(
+                "Treatment Type *", 
+                options=treatment_options,
+                key="treatment"
+            )
         
-        session = "N/A"
-        if treatment == "Diode Laser":
-            session = st.number_input(
-                "Session Number *", 
+            session_number = st.number_input(
+                "Session Number (Diode Laser only)", 
                 min_value=1, 
                 max_value=20, 
                 value=1,
                 key="session"
             )
-        else:
-            st.number_input(
-                "Session Number", 
-                min_value=1, 
-                max_value=20, 
-                value=1, 
-                disabled=True, 
-                key="disabled_session"
-            )
-            session = "N/A"
+            # Widgets inside a form don't rerun on change, so the session
+            # input can't be toggled by the treatment choice - it is only
+            # used for Diode Laser
+            session = session_number if treatment == "Diode Laser" else "N/A"
             
-        follow_up = st.date_input(
-            "Follow-up Date *", 
-            value=datetime.now().date(),
-            key="follow_up"
-        )
+            follow_up = st.date_input(
+                "Follow-up Date *", 
+                value=datetime.now().date(),
+                key="follow_up"
+            )
     
-    instructions = st.text_area(
-        "Instructions", 
-        placeholder="Enter patient instructions...", 
-        height=100,
-        key="instructions"
-    )
+        instructions = st.text_area(
+            "Instructions", 
+            placeholder="Enter patient instructions...", 
+            height=100,
+            key="instructions"
+        )
     
-    submitted = st.button("🚀 Generate Prescription", use_container_width=True, type="primary")
+        submitted = st.form_submit_button("🚀 Generate Prescription", use_container_width=True, type="primary")
     
     if submitted:
         if not patient_name.strip():
             st.error("❌ Please enter patient name!")
+            st.session_state.pop("last_form", None)
             return None
             
         if treatment == "Select Treatment":
             st.error("❌ Please select a treatment type!")
-            return None
-        
-        if treatment == "Diode Laser" and session == "N/A":
-            st.error("❌ Please enter session number for Diode Laser treatment!")
+            st.session_state.pop("last_form", None)
             return None
         
         form_data = {
@@ -302,6 +385,8 @@ def create_prescription_form():
             'session': session
         }
         
+        # Keep the last submitted payload across reruns
+        st.session_state["last_form"] = form_data
         return form_data
     
     return None
@@ -309,38 +394,88 @@ def create_prescription_form():
 def main():
     """Main application logic"""
     
-    if 'sheet' not in st.session_state:
-        st.session_state.sheet = setup_google_sheets()
+    # Cached per process, so this is cheap on every rerun
+    st.session_state.sheet = setup_google_sheets()
     
-    form_data = create_prescription_form()
+    # Every prescription needs the template, so check for it once up front
+    if not os.path.exists(TEMPLATE_PATH):
+        st.error(f"❌ PDF template not found at: {TEMPLATE_PATH}")
+        # List files to debug
+        st.write("Available files in templates folder:")
+        for pdf_path in Path(TEMPLATE_PATH).parent.glob("*.pdf"):
+            st.write(f"📄 {pdf_path}")
+        st.stop()
+    
+    # Load the template and resolve its fields while the form is being
+    # filled in rather than on the first submission; later reruns are cache hits
+    _write_plan(os.path.getmtime(TEMPLATE_PATH))
+    
+    # Reruns that aren't a new submission (download, sync, debug toggle)
+    # keep showing the last prescription
+    form_data = create_prescription_form() or st.session_state.get("last_form")
     
     if form_data:
         st.subheader("📋 Prescription Data")
-        st.write(f"*Patient Name:* {form_data['patient_name']}")
-        st.write(f"*Age:* {form_data['age']}")
-        st.write(f"*Date:* {form_data['date']}")
-        st.write(f"*Treatment:* {form_data['treatment_type']}")
-        st.write(f"*Session:* {form_data['session']}")
-        st.write(f"*Follow-up Date:* {form_data['follow_up_date']}")
-        st.write(f"*Instructions:* {form_data['instructions']}")
-        
-        prescription_id = None
-        if st.session_state.sheet:
-            with st.spinner("💾 Saving to Google Sheets..."):
-                prescription_id = save_to_google_sheets(st.session_state.sheet, form_data)
-        
-        with st.spinner("📄 Generating prescription PDF..."):
-            pdf_path = generate_pdf_prescription(form_data)
+        st.table([
+            {"Field": "Patient Name", "Value": form_data['patient_name']},
+            {"Field": "Age", "Value": str(form_data['age'])},
+            {"Field": "Date", "Value": form_data['date']},
+            {"Field": "Treatment", "Value": form_data['treatment_type']},
+            {"Field": "Session", "Value": str(form_data['session'])},
+            {"Field": "Follow-up Date", "Value": form_data['follow_up_date']},
+            {"Field": "Instructions", "Value": form_data['instructions']}
+        ])
+        
+        # Save and generate once per prescription; later reruns reuse the
+        # result instead of writing another Sheets row
+        form_key = hash(tuple(sorted(form_data.items())))
+        if st.session_state.get("last_key") != form_key:
+            sheet = st.session_state.sheet
+            prescription_id, row_data = build_sheet_row(form_data)
+            # Rows from failed saves ride along, so this is still a single request
+            rows = st.session_state.get('pending_rows', []) + [row_data]
+            
+            # The Sheets write waits on the network, so it runs in a worker
+            # while this thread fills the PDF (its st.cache_data lookups need
+            # this thread's script context); the worker only returns its status
+            with st.spinner("📄 Generating prescription..."):
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    sheet_future = executor.submit(save_to_google_sheets, sheet, rows) if sheet else None
+                    pdf_data, fill_log, pdf_error = generate_pdf_prescription(form_data)
+                    sheet_error = sheet_future.result() if sheet_future else None
             
-        if pdf_path:
+            # Report from this thread, in a fixed order
+            if not sheet:
+                prescription_id = None
+            elif sheet_error:
+                # Keep the rows for a retry instead of dropping them
+                st.session_state.pending_rows = rows
+                prescription_id = None
+                st.error(f"❌ Failed to save to Google Sheets: {sheet_error}")
+            else:
+                st.session_state.pending_rows = []
+                st.success(f"✅ Data saved to Google Sheets! Prescription ID: {prescription_id}")
+            show_pdf_status(fill_log, pdf_error)
+            
+            st.session_state.rx_id = prescription_id
+            st.session_state.pdf_bytes = pdf_data
+            st.session_state.last_key = form_key
+        elif st.session_state.pdf_bytes is None:
+            # The row is already saved or kept for retry - only retry the PDF
+            with st.spinner("📄 Generating prescription PDF..."):
+                pdf_data, fill_log, pdf_error = generate_pdf_prescription(form_data)
+            show_pdf_status(fill_log, pdf_error)
+            st.session_state.pdf_bytes = pdf_data
+        
+        prescription_id = st.session_state.rx_id
+        pdf_data = st.session_state.pdf_bytes
+        
+        if pdf_data:
             success_msg = f"🎉 Prescription for *{form_data['patient_name']}* generated successfully!"
             if prescription_id:
                 success_msg += f" Prescription ID: *{prescription_id}*"
             st.success(success_msg)
             
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_data = pdf_file.read()
-            
             st.download_button(
                 label="📄 Download Prescription PDF",
                 data=pdf_data,
@@ -349,13 +484,16 @@ def main():
                 use_container_width=True
             )
             
-            # Clean up
-            try:
-                os.unlink(pdf_path)
-            except:
-                pass
-            
             st.info("💡 Ready to create another prescription? Refresh the page to start over.")
+    
+    # Rendered after the save so it reflects this run's result
+    if st.session_state.get('pending_rows'):
+        warning_slot = st.empty()
+        if st.session_state.sheet and st.button("🔄 Retry saving to Google Sheets"):
+            flush_pending_rows(st.session_state.sheet)
+        pending = st.session_state.pending_rows
+        if pending:
+            warning_slot.warning(f"⚠️ {len(pending)} prescription(s) could not be saved to Google Sheets - retry before refreshing the page, or they will be lost.")
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()